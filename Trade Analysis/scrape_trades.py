@@ -2,30 +2,82 @@
  
 import argparse
 import csv
-import json
+import functools
+import heapq
+import itertools
+import re
 import sys
+import tempfile
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from urllib.parse import quote
  
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError as exc:
     print("Missing dependency: requests. Install with: pip install requests", file=sys.stderr)
     raise SystemExit(1) from exc
  
+try:
+    import orjson
+except ImportError as exc:
+    print("Missing dependency: orjson. Install with: pip install orjson", file=sys.stderr)
+    raise SystemExit(1) from exc
+ 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+ 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+ 
  
 SEARCH_URL = "https://gamma-api.polymarket.com/public-search"
 ACTIVITY_URL = "https://data-api.polymarket.com/activity"
-MARKET_SLUG_URL = "https://gamma-api.polymarket.com/markets/slug/{}"
+MARKET_SLUG_BASE_URL = "https://gamma-api.polymarket.com/markets/slug/"
+MARKET_TIMES_CACHE_FILE = ".slug_cache.json"
+MARKET_TIMES_CACHE_TTL = 6 * 60 * 60
+NUMPY_TIMING_MIN_ROWS = 500
+HTTP_POOL_SIZE = 32
+ACTIVITY_CHUNK_SIZE = 64 * 1024
+ACTIVITY_STREAM_MIN_BYTES = 8 * 1024 * 1024
+ 
+_TZ_FIX = re.compile(r"([+-]\d{2})(\d{2})?$")
+ 
+# requests only speaks HTTP/1.1, so concurrency comes from a bounded pool of
+# keep-alive connections: workers wait for a free one rather than opening
+# throwaway connections once the pool is exhausted.
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        pool_block=True,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 503, 504],
+        ),
+    ),
+)
+SESSION.headers["Accept-Encoding"] = "gzip"
+SESSION.headers["User-Agent"] = "scrape-trades/1.0"
  
  
 def fetch_search(query: str, timeout: int = 30) -> dict:
-    response = requests.get(SEARCH_URL, params={"q": query}, timeout=timeout)
+    response = SESSION.get(SEARCH_URL, params={"q": query}, timeout=timeout)
     response.raise_for_status()
-    return response.json()
+    return orjson.loads(response.content)
  
  
 def extract_markets(payload: dict) -> List[Dict[str, str]]:
@@ -64,9 +116,13 @@ def print_markets_table(markets: List[Dict[str, str]]) -> None:
         return
  
     max_idx = len(str(len(markets)))
-    max_condition = min(66, max(len(m.get("condition_id", "")) for m in markets))
-    max_question = min(72, max(len(m.get("question", "")) for m in markets))
-    max_event = max(len(m.get("event_title", "")) for m in markets)
+    max_condition = max_question = max_event = 0
+    for market in markets:
+        max_condition = max(max_condition, len(market.get("condition_id", "")))
+        max_question = max(max_question, len(market.get("question", "")))
+        max_event = max(max_event, len(market.get("event_title", "")))
+    max_condition = min(66, max_condition)
+    max_question = min(72, max_question)
  
     header = (
         f"{'Idx':>{max_idx}}  "
@@ -98,31 +154,29 @@ def parse_selection(selection: str, markets: List[Dict[str, str]]) -> List[Dict[
         return list(markets)
  
     by_condition = {m["condition_id"]: m for m in markets}
+ 
+    def resolve(token: str) -> Optional[Dict[str, str]]:
+        if token.isdigit():
+            idx = int(token)
+            return markets[idx - 1] if 1 <= idx <= len(markets) else None
+        return by_condition.get(token)
+ 
     chosen = []
     seen = set()
- 
-    for part in selection.split(","):
-        token = part.strip()
+    for token in map(str.strip, selection.split(",")):
         if not token:
             continue
-        if token.isdigit():
-            idx = int(token)
-            if 1 <= idx <= len(markets):
-                market = markets[idx - 1]
-                condition_id = market["condition_id"]
-                if condition_id not in seen:
-                    chosen.append(market)
-                    seen.add(condition_id)
-            else:
+        market = resolve(token)
+        if market is None:
+            if token.isdigit():
                 print(f"Skipping invalid index: {token}")
-        else:
-            market = by_condition.get(token)
-            if market:
-                if token not in seen:
-                    chosen.append(market)
-                    seen.add(token)
             else:
                 print(f"Skipping unknown conditionId: {token}")
+            continue
+        condition_id = market["condition_id"]
+        if condition_id not in seen:
+            chosen.append(market)
+            seen.add(condition_id)
  
     return chosen
  
@@ -134,24 +188,30 @@ def parse_activity_response(data) -> Tuple[List[dict], Optional[str], Optional[b
     if not isinstance(data, dict):
         raise RuntimeError(f"Unexpected activity response type: {type(data)}")
  
-    items = None
-    for key in ("activity", "items", "results", "data"):
-        if isinstance(data.get(key), list):
-            items = data[key]
-            break
-    if items is None and isinstance(data.get("result"), list):
-        items = data["result"]
+    # "activity" and "nextCursor" are the keys the API actually returns, so
+    # they are probed directly before falling back to the other spellings.
+    items = data.get("activity")
+    if not isinstance(items, list):
+        items = None
+        for key in ("items", "results", "data", "result"):
+            value = data.get(key)
+            if isinstance(value, list):
+                items = value
+                break
  
     if items is None:
         raise RuntimeError(
             f"Unexpected activity response shape. Keys: {', '.join(sorted(data.keys()))}"
         )
  
-    cursor = None
-    for key in ("nextCursor", "next_cursor", "cursor", "next"):
-        if data.get(key):
-            cursor = data.get(key)
-            break
+    cursor = data.get("nextCursor")
+    if not cursor:
+        cursor = None
+        for key in ("next_cursor", "cursor", "next"):
+            value = data.get(key)
+            if value:
+                cursor = value
+                break
  
     pagination = data.get("pagination") if isinstance(data.get("pagination"), dict) else {}
     if not cursor and pagination:
@@ -174,6 +234,33 @@ def parse_activity_response(data) -> Tuple[List[dict], Optional[str], Optional[b
     return items, cursor, has_more
  
  
+def read_activity_payload(response: requests.Response):
+    # ijson is much slower than orjson, so it is only worth it when the body
+    # (as sent, possibly compressed) is too large to buffer comfortably.
+    length = response.headers.get("Content-Length", "")
+    if ijson is None or not length.isdigit() or int(length) < ACTIVITY_STREAM_MIN_BYTES:
+        return orjson.loads(response.content)
+ 
+    chunks = response.iter_content(chunk_size=ACTIVITY_CHUNK_SIZE)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if head.lstrip():
+            break
+    if not head.lstrip().startswith(b"["):
+        return orjson.loads(head + b"".join(chunks))
+ 
+    # Top-level arrays are parsed incrementally as chunks come off the socket,
+    # so the full body is never buffered alongside the decoded rows.
+    items = ijson.sendable_list()
+    parser = ijson.items_coro(items, "item", use_float=True)
+    parser.send(head)
+    for chunk in chunks:
+        parser.send(chunk)
+    parser.close()
+    return items
+ 
+ 
 def fetch_activity(
     user: str,
     condition_id: str,
@@ -201,22 +288,24 @@ def fetch_activity(
             return (pick_key(items[0]), pick_key(items[-1]), len(items))
         return (str(items[0])[:80], str(items[-1])[:80], len(items))
  
+    params = {
+        "limit": limit,
+        "sortBy": "TIMESTAMP",
+        "sortDirection": "DESC",
+        "user": user,
+        "market": condition_id,
+    }
     while True:
-        params = {
-            "limit": limit,
-            "sortBy": "TIMESTAMP",
-            "sortDirection": "DESC",
-            "user": user,
-            "market": condition_id,
-        }
         if cursor:
+            params.pop("offset", None)
             params["cursor"] = cursor
         else:
+            params.pop("cursor", None)
             params["offset"] = offset
  
-        response = requests.get(ACTIVITY_URL, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+        with SESSION.get(ACTIVITY_URL, params=params, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            data = read_activity_payload(response)
  
         items, next_cursor, has_more = parse_activity_response(data)
         if not items:
@@ -231,7 +320,7 @@ def fetch_activity(
         all_items.extend(items)
         page += 1
         print(
-            f"  page {page}: +{len(items)} rows (total {len(all_items)})",
+            f"  {condition_id[:10]} page {page}: +{len(items)} rows (total {len(all_items)})",
             flush=True,
         )
  
@@ -268,15 +357,16 @@ def prompt(value: str, default: Optional[str] = None) -> str:
     return response if response else (default or "")
  
  
+@functools.lru_cache(maxsize=128)
 def is_hex_address(value: str) -> bool:
     value = value.strip()
     if not value.startswith("0x") or len(value) != 42:
         return False
     try:
-        int(value[2:], 16)
+        # fromhex() skips whitespace, so also require all 20 bytes to be present.
+        return len(bytes.fromhex(value[2:])) == 20
     except ValueError:
         return False
-    return True
  
  
 def prompt_user_address(default: Optional[str] = None) -> str:
@@ -301,6 +391,12 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--select", help="Comma-separated indices or conditionIds, or 'all'.")
     parser.add_argument("--limit", type=int, default=50, help="Page size for activity requests.")
     parser.add_argument("--max-pages", type=int, help="Optional max pages per market.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of markets fetched concurrently.",
+    )
     parser.add_argument(
         "--out",
         default="activity-exports",
@@ -323,35 +419,49 @@ def parse_args() -> argparse.Namespace:
 def normalize_csv_value(value):
     if value is None:
         return ""
-    if isinstance(value, (dict, list)):
-        return json.dumps(value, separators=(",", ":"), ensure_ascii=True)
+    value_type = type(value)
+    if value_type is dict or value_type is list:
+        return orjson.dumps(value).decode("utf-8")
     return value
  
  
+@functools.lru_cache(maxsize=8192)
+def _epoch_iso(ts) -> str:
+    # Matched fills often share an epoch second, so conversions repeat a lot.
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+ 
+ 
 def timestamp_to_iso(value):
-    if isinstance(value, (int, float)):
-        return datetime.fromtimestamp(value, tz=timezone.utc).isoformat()
+    # Exact int/float checks cover parsed JSON; isinstance() catches subclasses.
+    value_type = type(value)
+    if value_type is int or value_type is float or isinstance(value, (int, float)):
+        return _epoch_iso(value)
     return ""
  
  
+def _tz_fix(match: "re.Match[str]") -> str:
+    return f"{match.group(1)}:{match.group(2) or '00'}"
+ 
+ 
+@functools.lru_cache(maxsize=4096)
+def _parse_iso_cached(raw: str):
+    if raw.endswith("Z"):
+        raw = raw[:-1] + "+00:00"
+    raw = _TZ_FIX.sub(_tz_fix, raw, count=1)
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d %H:%M:%S%z")
+    except ValueError:
+        return None
+ 
+ 
 def parse_iso_datetime(value: str):
     if not value:
         return None
-    raw = value.strip()
-    if raw.endswith("Z"):
-        raw = raw[:-1] + "+00:00"
-    if len(raw) >= 3 and raw[-3] in "+-" and raw[-2:].isdigit():
-        raw = raw + ":00"
-    elif len(raw) >= 5 and raw[-5] in "+-" and raw[-4:].isdigit() and ":" not in raw[-5:]:
-        raw = raw[:-2] + ":" + raw[-2:]
-    for fmt in (None, "%Y-%m-%d %H:%M:%S%z"):
-        try:
-            if fmt:
-                return datetime.strptime(raw, fmt)
-            return datetime.fromisoformat(raw)
-        except ValueError:
-            continue
-    return None
+    return _parse_iso_cached(value.strip())
  
  
 def normalize_iso(value: str) -> Optional[str]:
@@ -373,9 +483,10 @@ def iso_to_epoch(value: str):
  
  
 def normalize_trade_timestamp(value):
-    if isinstance(value, (int, float)):
+    value_type = type(value)
+    if value_type is int or value_type is float or isinstance(value, (int, float)):
         ts = float(value)
-    elif isinstance(value, str):
+    elif value_type is str or isinstance(value, str):
         raw = value.strip()
         if not raw:
             return None
@@ -405,12 +516,12 @@ def fetch_market_info_by_slug(market_slug: str, timeout: int = 30) -> Optional[d
     slug = (market_slug or "").strip()
     if not slug:
         return None
-    url = MARKET_SLUG_URL.format(quote(slug))
+    url = MARKET_SLUG_BASE_URL + quote(slug, safe="")
     try:
-        response = requests.get(url, timeout=timeout)
+        response = SESSION.get(url, timeout=timeout)
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as exc:
+        return orjson.loads(response.content)
+    except (requests.RequestException, orjson.JSONDecodeError) as exc:
         print(f"Warning: market info fetch failed for slug {slug}: {exc}")
         return None
  
@@ -449,54 +560,151 @@ def pick_market_end_time(market_payload: dict) -> Tuple[Optional[str], Optional[
     return None, None
  
  
-def build_csv_columns(rows: List[dict]) -> List[str]:
-    preferred = [
-        "searchQuery",
-        "userAddress",
-        "timestamp",
-        "timestampIso",
-        "tradeTiming",
-        "type",
-        "side",
-        "outcome",
-        "outcomeIndex",
-        "size",
-        "usdcSize",
-        "price",
-        "marketQuestion",
-        "conditionId",
-        "marketSlug",
-        "marketId",
-        "marketStartTime",
-        "marketStartTimeIso",
-        "marketStartTimeSource",
-        "marketEndTime",
-        "marketEndTimeIso",
-        "marketEndTimeSource",
-        "marketEventTitle",
-        "transactionHash",
-        "asset",
-        "proxyWallet",
-        "name",
-        "pseudonym",
-        "title",
-        "slug",
-        "eventSlug",
-        "icon",
-        "profileImage",
-        "profileImageOptimized",
-        "bio",
-    ]
-    all_keys = set()
-    for row in rows:
-        all_keys.update(row.keys())
-    columns = [key for key in preferred if key in all_keys]
-    for key in sorted(all_keys):
-        if key not in columns:
-            columns.append(key)
+def market_times_entry(market_payload: dict, fetched_at: float) -> dict:
+    start_raw, start_source = pick_market_start_time(market_payload)
+    end_raw, end_source = pick_market_end_time(market_payload)
+    return {
+        "start_raw": start_raw,
+        "start_source": start_source,
+        "end_raw": end_raw,
+        "end_source": end_source,
+        "fetched_at": fetched_at,
+    }
+ 
+ 
+MARKET_TIMES_TEXT_FIELDS = ("start_raw", "start_source", "end_raw", "end_source")
+ 
+ 
+def is_valid_market_times_entry(entry, now: float) -> bool:
+    if not isinstance(entry, dict):
+        return False
+    fetched_at = entry.get("fetched_at")
+    # A timestamp from the future would keep the entry fresh forever.
+    if type(fetched_at) not in (int, float) or not fetched_at <= now:
+        return False
+    for key in MARKET_TIMES_TEXT_FIELDS:
+        value = entry.get(key)
+        if value is not None and not isinstance(value, str):
+            return False
+    return True
+ 
+ 
+def load_market_times_cache(path: Path, now: float) -> Dict[str, dict]:
+    try:
+        cache = orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return {
+        slug: entry for slug, entry in cache.items() if is_valid_market_times_entry(entry, now)
+    }
+ 
+ 
+def save_market_times_cache(path: Path, cache: Dict[str, dict]) -> None:
+    path.write_bytes(orjson.dumps(cache))
+ 
+ 
+CSV_PREFERRED_COLUMNS = (
+    "searchQuery",
+    "userAddress",
+    "timestamp",
+    "timestampIso",
+    "tradeTiming",
+    "type",
+    "side",
+    "outcome",
+    "outcomeIndex",
+    "size",
+    "usdcSize",
+    "price",
+    "marketQuestion",
+    "conditionId",
+    "marketSlug",
+    "marketId",
+    "marketStartTime",
+    "marketStartTimeIso",
+    "marketStartTimeSource",
+    "marketEndTime",
+    "marketEndTimeIso",
+    "marketEndTimeSource",
+    "marketEventTitle",
+    "transactionHash",
+    "asset",
+    "proxyWallet",
+    "name",
+    "pseudonym",
+    "title",
+    "slug",
+    "eventSlug",
+    "icon",
+    "profileImage",
+    "profileImageOptimized",
+    "bio",
+)
+CSV_PREFERRED_SET = frozenset(CSV_PREFERRED_COLUMNS)
+ 
+ 
+def build_csv_columns(all_keys: Set[str]) -> List[str]:
+    columns = [key for key in CSV_PREFERRED_COLUMNS if key in all_keys]
+    columns.extend(sorted(all_keys - CSV_PREFERRED_SET))
     return columns
  
  
+def classify_trade_timing(
+    trade_epochs: List[Optional[int]],
+    start_epoch: Optional[int],
+    end_epoch: Optional[int],
+) -> List[str]:
+    if start_epoch is None:
+        return ["unknown"] * len(trade_epochs)
+    check_end = end_epoch is not None and end_epoch > start_epoch
+ 
+    if np is not None and len(trade_epochs) > NUMPY_TIMING_MIN_ROWS:
+        # Normalized trade epochs are never negative, so -1 marks a missing one.
+        epochs = np.fromiter(
+            (-1 if epoch is None else epoch for epoch in trade_epochs),
+            dtype=np.int64,
+            count=len(trade_epochs),
+        )
+        conditions = [epochs == -1, epochs < start_epoch]
+        choices = ["unknown", "before_start"]
+        if check_end:
+            conditions.append(epochs > end_epoch)
+            choices.append("after_end")
+        return np.select(conditions, choices, default="during").tolist()
+ 
+    timings = []
+    for trade_epoch in trade_epochs:
+        if trade_epoch is None:
+            timings.append("unknown")
+        elif trade_epoch < start_epoch:
+            timings.append("before_start")
+        elif check_end and trade_epoch > end_epoch:
+            timings.append("after_end")
+        else:
+            timings.append("during")
+    return timings
+ 
+ 
+def combined_sort_key(row: dict):
+    timestamp = row.get("timestamp")
+    return timestamp if isinstance(timestamp, (int, float)) else -1
+ 
+ 
+def spill_rows(path: Path, rows: List[dict]) -> None:
+    with path.open("wb") as handle:
+        for row in rows:
+            handle.write(orjson.dumps(row))
+            handle.write(b"\n")
+ 
+ 
+def iter_spilled_rows(path: Path) -> Iterator[dict]:
+    with path.open("rb") as handle:
+        for line in handle:
+            yield orjson.loads(line)
+ 
+ 
 def main() -> None:
     args = parse_args()
  
@@ -534,108 +742,175 @@ def main() -> None:
     if not args.no_save:
         output_dir.mkdir(parents=True, exist_ok=True)
  
-    combined_rows = []
-    market_info_cache = {}
+    # Each market's rows are sorted and spilled to disk as soon as its download
+    # is consumed, then merged into the combined CSV. Besides that market, at
+    # most --workers downloads are in flight or waiting to be consumed.
+    # Market start/end times only feed the combined CSV rows, so the slug
+    # lookups and row building are skipped entirely without it.
+    need_times = not args.no_combined
+    spill_dir = tempfile.TemporaryDirectory(prefix="scrape-trades-") if need_times else None
+    spill_paths = []
+    combined_keys = set()
+    market_times_path = output_dir / MARKET_TIMES_CACHE_FILE
+    now = time.time()
+    market_times_cache = load_market_times_cache(market_times_path, now) if need_times else {}
  
     print(f"Fetching activity for {len(selected)} market(s)...")
-    for market in selected:
-        condition_id = market["condition_id"]
-        question = market.get("question", "")
-        event_title = market.get("event_title", "")
-        market_id = market.get("market_id", "")
-        market_slug = market.get("slug", "")
- 
-        market_info = None
-        cache_key = market_slug.strip()
-        if cache_key:
-            market_info = market_info_cache.get(cache_key)
-            if market_info is None:
-                market_info = fetch_market_info_by_slug(cache_key)
-                market_info_cache[cache_key] = market_info
-        else:
-            print(f"Warning: missing market slug for {condition_id}")
- 
-        start_raw, start_source = pick_market_start_time(market_info or {})
-        end_raw, end_source = pick_market_end_time(market_info or {})
-        start_iso = normalize_iso(start_raw) if start_raw else None
-        end_iso = normalize_iso(end_raw) if end_raw else None
-        start_epoch = iso_to_epoch(start_iso) if start_iso else None
-        end_epoch = iso_to_epoch(end_iso) if end_iso else None
- 
-        print(f"- {condition_id} | {question}")
-        items = fetch_activity(
-            user=user,
-            condition_id=condition_id,
-            limit=args.limit,
-            max_pages=args.max_pages,
-        )
-        print(f"  Retrieved {len(items)} activity rows.")
- 
-        for item in items:
-            row = dict(item) if isinstance(item, dict) else {"raw": item}
-            row["marketQuestion"] = question
-            row["marketEventTitle"] = event_title
-            row["marketId"] = market_id
-            row["marketSlug"] = market_slug
-            row["searchQuery"] = search_query
-            row["userAddress"] = user
-            trade_epoch = normalize_trade_timestamp(row.get("timestamp"))
-            row["timestampIso"] = (
-                datetime.fromtimestamp(trade_epoch, tz=timezone.utc).isoformat()
-                if trade_epoch is not None
-                else timestamp_to_iso(row.get("timestamp"))
-            )
-            row["marketStartTime"] = start_raw or ""
-            row["marketStartTimeIso"] = start_iso or ""
-            row["marketStartTimeSource"] = start_source or ""
-            row["marketEndTime"] = end_raw or ""
-            row["marketEndTimeIso"] = end_iso or ""
-            row["marketEndTimeSource"] = end_source or ""
- 
-            if trade_epoch is not None and start_epoch is not None:
-                if trade_epoch < start_epoch:
-                    trade_timing = "before_start"
-                else:
-                    if (
-                        end_epoch is not None
-                        and start_epoch is not None
-                        and end_epoch > start_epoch
-                        and trade_epoch > end_epoch
-                    ):
-                        trade_timing = "after_end"
-                    else:
-                        trade_timing = "during"
-            else:
-                trade_timing = "unknown"
-            row["tradeTiming"] = trade_timing
- 
-            combined_rows.append(row)
- 
-        if not args.no_save:
-            output_path = output_dir / f"{condition_id}.json"
-            payload = {
-                "user": user,
-                "conditionId": condition_id,
-                "question": question,
-                "eventTitle": event_title,
-                "activity": items,
-            }
-            output_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
- 
-    if combined_rows and not args.no_combined:
-        combined_rows.sort(
-            key=lambda row: row.get("timestamp") if isinstance(row.get("timestamp"), (int, float)) else -1,
-            reverse=True,
+    # Slug lookups are submitted up front; activity downloads are kept to a
+    # window of --workers markets, and each market's pages are still
+    # requested sequentially.
+    workers = max(1, args.workers)
+    fetch_market_activity = functools.partial(
+        fetch_activity, user=user, limit=args.limit, max_pages=args.max_pages
+    )
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        market_info_futures = {}
+        for market in selected if need_times else ():
+            cache_key = market.get("slug", "").strip()
+            if not cache_key or cache_key in market_info_futures:
+                continue
+            cached = market_times_cache.get(cache_key)
+            if cached and now - cached.get("fetched_at", 0) < MARKET_TIMES_CACHE_TTL:
+                continue
+            market_info_futures[cache_key] = pool.submit(fetch_market_info_by_slug, cache_key)
+        to_fetch = iter(selected)
+        pending = deque(
+            (market, pool.submit(fetch_market_activity, condition_id=market["condition_id"]))
+            for market in itertools.islice(to_fetch, workers)
         )
+ 
+        # Results are consumed in selection order while later markets are still
+        # downloading. On Ctrl-C or any error, queued fetches are cancelled
+        # instead of being run to completion by the pool's shutdown.
+        try:
+            fetched_market_times = False
+            for cache_key, market_info_future in market_info_futures.items():
+                market_info = market_info_future.result()
+                if market_info is not None:
+                    market_times_cache[cache_key] = market_times_entry(market_info, now)
+                    fetched_market_times = True
+            # --no-save leaves the output directory untouched, cache included.
+            if fetched_market_times and not args.no_save:
+                save_market_times_cache(market_times_path, market_times_cache)
+ 
+            while pending:
+                # Popping drops the queue's reference, so the future and its
+                # rows are freed once this iteration releases them. The next
+                # market is submitted before waiting so the window stays full.
+                market, activity_future = pending.popleft()
+                next_market = next(to_fetch, None)
+                if next_market is not None:
+                    pending.append(
+                        (
+                            next_market,
+                            pool.submit(
+                                fetch_market_activity, condition_id=next_market["condition_id"]
+                            ),
+                        )
+                    )
+                condition_id = market["condition_id"]
+                question = market.get("question", "")
+                event_title = market.get("event_title", "")
+                market_id = market.get("market_id", "")
+                market_slug = market.get("slug", "")
+ 
+                market_times = {}
+                cache_key = market_slug.strip()
+                if cache_key:
+                    market_times = market_times_cache.get(cache_key) or {}
+                elif need_times:
+                    print(f"Warning: missing market slug for {condition_id}")
+ 
+                start_raw = market_times.get("start_raw")
+                start_source = market_times.get("start_source")
+                end_raw = market_times.get("end_raw")
+                end_source = market_times.get("end_source")
+                start_iso = normalize_iso(start_raw) if start_raw else None
+                end_iso = normalize_iso(end_raw) if end_raw else None
+                start_epoch = iso_to_epoch(start_iso) if start_iso else None
+                end_epoch = iso_to_epoch(end_iso) if end_iso else None
+ 
+                print(f"- {condition_id} | {question}")
+                items = activity_future.result()
+                del activity_future
+                print(f"  Retrieved {len(items)} activity rows.")
+ 
+                if not args.no_save:
+                    output_path = output_dir / f"{condition_id}.json"
+                    payload = {
+                        "user": user,
+                        "conditionId": condition_id,
+                        "question": question,
+                        "eventTitle": event_title,
+                        "activity": items,
+                    }
+                    output_path.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+ 
+                if not need_times:
+                    del items
+                    continue
+ 
+                # The raw export is written above, so activity dicts can be extended in place.
+                market_rows = []
+                trade_epochs = []
+                for item in items:
+                    row = item if isinstance(item, dict) else {"raw": item}
+                    row["marketQuestion"] = question
+                    row["marketEventTitle"] = event_title
+                    row["marketId"] = market_id
+                    row["marketSlug"] = market_slug
+                    row["searchQuery"] = search_query
+                    row["userAddress"] = user
+                    trade_epoch = normalize_trade_timestamp(row.get("timestamp"))
+                    row["timestampIso"] = (
+                        _epoch_iso(trade_epoch)
+                        if trade_epoch is not None
+                        else timestamp_to_iso(row.get("timestamp"))
+                    )
+                    row["marketStartTime"] = start_raw or ""
+                    row["marketStartTimeIso"] = start_iso or ""
+                    row["marketStartTimeSource"] = start_source or ""
+                    row["marketEndTime"] = end_raw or ""
+                    row["marketEndTimeIso"] = end_iso or ""
+                    row["marketEndTimeSource"] = end_source or ""
+                    market_rows.append(row)
+                    trade_epochs.append(trade_epoch)
+ 
+                timings = classify_trade_timing(trade_epochs, start_epoch, end_epoch)
+                for row, trade_timing in zip(market_rows, timings):
+                    row["tradeTiming"] = trade_timing
+                    combined_keys.update(row)
+ 
+                if market_rows:
+                    market_rows.sort(key=combined_sort_key, reverse=True)
+                    spill_path = Path(spill_dir.name) / f"{len(spill_paths)}.jsonl"
+                    spill_rows(spill_path, market_rows)
+                    spill_paths.append(spill_path)
+                del items, market_rows, trade_epochs, timings
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+ 
+    if spill_paths:
         combined_path = Path(args.combined_out)
         combined_path.parent.mkdir(parents=True, exist_ok=True)
-        columns = build_csv_columns(combined_rows)
+        columns = build_csv_columns(combined_keys)
+        # heapq.merge keeps input order for equal keys, matching a stable sort.
+        combined_rows = heapq.merge(
+            *(iter_spilled_rows(path) for path in spill_paths),
+            key=combined_sort_key,
+            reverse=True,
+        )
         with combined_path.open("w", newline="", encoding="utf-8") as handle:
-            writer = csv.DictWriter(handle, fieldnames=columns)
-            writer.writeheader()
+            writer = csv.writer(handle)
+            writer.writerow(columns)
+            write_row = writer.writerow
             for row in combined_rows:
-                writer.writerow({key: normalize_csv_value(row.get(key)) for key in columns})
+                get = row.get
+                write_row([normalize_csv_value(get(key)) for key in columns])
         print(f"Combined CSV written to {combined_path}")
+    if spill_dir is not None:
+        spill_dir.cleanup()
  
     print("Done.")
  
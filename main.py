@@ -1,33 +1,107 @@
 import argparse
 import asyncio
+import functools
+import http.client
 import json
+import mmap
+import operator
 import os
 import random
 import re
+import string
 import sys
-import time
-import urllib.error
 import urllib.request
 
 import websockets
+from websockets.asyncio.client import connect as ws_connect
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if sys.platform == "win32":
+    try:
+        import winloop as _event_loop
+    except ImportError:
+        _event_loop = asyncio
+else:
+    try:
+        import uvloop as _event_loop
+    except ImportError:
+        _event_loop = asyncio
+
+# run() only exists from uvloop 0.18; older releases fall back to asyncio.
+if not hasattr(_event_loop, "run"):
+    _event_loop = asyncio
+
+if orjson is not None:
+    _loads = orjson.loads
+    _JSON_ERRORS: tuple[type[Exception], ...] = (orjson.JSONDecodeError, json.JSONDecodeError)
+
+    def _dumps(obj: object) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+else:
+    _loads = json.loads
+    _JSON_ERRORS = (json.JSONDecodeError,)
+    _dumps = json.dumps
 
 DEFAULT_ENDPOINT = "wss://spro.agency/api/playbyplay"
 GAMES_ENDPOINT = "https://spro.agency/api/get_games"
 API_KEY_ENV = "BOLTODDS_API_KEY"
+MESSAGE_QUEUE_SIZE = 256
+STDOUT_FLUSH_INTERVAL = 0.1
+DEFLATE_WINDOW_BITS = 12
+
+# One match per non-empty line; \r, \n and \r\n all end a line, as in text mode.
+_ENV_LINE_RE = re.compile(rb"[^\r\n]+")
+_POLICY_ERR = re.compile(r"too many concurrent connections|http 503", re.IGNORECASE)
+
+_SCORE_GET = operator.itemgetter("home", "away")
+_PLAY_GET = operator.itemgetter("type", "team", "points", "seconds", "name")
 # Run: BOLTODDS_API_KEY=... python main.py
 
 
+class _NormalizeTable(dict):
+    # str.translate table: keep [a-z0-9], map every other code point to a space.
+    # Latin-1 is prefilled; anything wider is filled in on first sight.
+    def __missing__(self, codepoint: int) -> str:
+        self[codepoint] = " "
+        return " "
+
+
+_KEEP = frozenset(string.ascii_lowercase + string.digits)
+_TRANS = _NormalizeTable(
+    (codepoint, chr(codepoint) if chr(codepoint) in _KEEP else " ")
+    for codepoint in range(256)
+)
+
+
 def load_env_file(path: str = ".env") -> None:
     try:
-        with open(path, "r", encoding="utf-8") as handle:
-            for raw_line in handle:
-                line = raw_line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                key, value = line.split("=", 1)
-                key = key.strip()
-                value = value.strip().strip('"').strip("'")
-                os.environ.setdefault(key, value)
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                return
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for match in _ENV_LINE_RE.finditer(data):
+                    raw_line = match.group()
+                    # Lines without "=" are skipped before paying for a decode.
+                    if b"=" not in raw_line:
+                        continue
+                    line = raw_line.decode("utf-8").strip()
+                    if line.startswith("#"):
+                        continue
+                    key, value = line.split("=", 1)
+                    key = key.strip()
+                    value = value.strip().strip('"').strip("'")
+                    os.environ.setdefault(key, value)
     except FileNotFoundError:
         return
 
@@ -37,45 +111,30 @@ def build_ws_url(endpoint: str, api_key: str) -> str:
     return f"{endpoint}{separator}key={api_key}"
 
 
-def format_new_play(message: str) -> str | None:
+def format_new_play(message: str | bytes) -> str | None:
     try:
-        payload = json.loads(message)
-    except json.JSONDecodeError:
+        payload = _loads(message)
+    except _JSON_ERRORS:
         return None
 
-    if not isinstance(payload, dict):
-        return None
-    if payload.get("action") != "new_play":
+    # Decoded JSON holds only dicts, lists and scalars, so a wrong container
+    # type raises TypeError and a missing field KeyError/IndexError.
+    try:
+        if payload["action"] != "new_play":
+            return None
+        home = payload["home"]
+        away = payload["away"]
+        home_score, away_score = _SCORE_GET(payload["score"])
+        play_type, play_team, play_points, play_seconds, play_name = _PLAY_GET(
+            payload["play_info"][0]
+        )
+    except (KeyError, TypeError, IndexError):
         return None
 
-    home = payload.get("home")
-    away = payload.get("away")
-    score = payload.get("score")
-    play_info = payload.get("play_info")
-
     if (
         not home
         or not away
-        or not isinstance(score, dict)
-        or not isinstance(play_info, list)
-        or not play_info
-    ):
-        return None
-
-    home_score = score.get("home")
-    away_score = score.get("away")
-    play = play_info[0]
-    if not isinstance(play, dict):
-        return None
-
-    play_type = play.get("type")
-    play_team = play.get("team")
-    play_points = play.get("points")
-    play_seconds = play.get("seconds")
-    play_name = play.get("name")
-
-    if (
-        home_score is None
+        or home_score is None
         or away_score is None
         or play_type is None
         or play_team is None
@@ -91,15 +150,19 @@ def format_new_play(message: str) -> str | None:
     )
 
 
-def fetch_games(api_key: str) -> list[str]:
-    url = f"{GAMES_ENDPOINT}?key={api_key}"
-    try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            payload = json.loads(response.read().decode("utf-8"))
-    except (urllib.error.URLError, json.JSONDecodeError) as exc:
-        raise RuntimeError(f"Failed to fetch games: {exc}") from exc
+def _game_name(item: object) -> str | None:
+    if type(item) is str:
+        return item
+    if type(item) is dict:
+        for key in ("game", "event", "name", "matchup", "title"):
+            value = item.get(key)
+            if value:
+                return str(value)
+    return None
 
-    if isinstance(payload, dict):
+
+def _games_from_payload(payload: object) -> list[str]:
+    if type(payload) is dict:
         for key in ("games", "data", "events", "results"):
             if key in payload:
                 payload = payload[key]
@@ -109,20 +172,31 @@ def fetch_games(api_key: str) -> list[str]:
                 raise RuntimeError(f"Failed to fetch games: {payload}")
             payload = list(payload.values())
 
-    if not isinstance(payload, list):
+    if type(payload) is not list:
         raise RuntimeError("Unexpected games payload format")
 
-    games: list[str] = []
-    for item in payload:
-        if isinstance(item, str):
-            games.append(item)
-            continue
-        if isinstance(item, dict):
-            for key in ("game", "event", "name", "matchup", "title"):
-                value = item.get(key)
-                if value:
-                    games.append(str(value))
-                    break
+    return [name for name in map(_game_name, payload) if name is not None]
+
+
+def _stream_games(response) -> list[str]:
+    # Top-level arrays are parsed item by item straight off the socket.
+    try:
+        items = ijson.items(response, "item", use_float=True)
+        return [name for name in map(_game_name, items) if name is not None]
+    except ijson.JSONError as exc:
+        raise RuntimeError(f"Failed to fetch games: {exc}") from exc
+
+
+def fetch_games(api_key: str) -> list[str]:
+    url = f"{GAMES_ENDPOINT}?key={api_key}"
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            if ijson is not None and response.peek(1).lstrip()[:1] == b"[":
+                games = _stream_games(response)
+            else:
+                games = _games_from_payload(_loads(response.read()))
+    except (OSError, http.client.HTTPException, *_JSON_ERRORS) as exc:
+        raise RuntimeError(f"Failed to fetch games: {exc}") from exc
 
     if not games:
         raise RuntimeError("No games found in payload")
@@ -130,8 +204,9 @@ def fetch_games(api_key: str) -> list[str]:
     return games
 
 
+@functools.lru_cache(maxsize=1024)
 def _normalize(text: str) -> str:
-    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+    return " ".join(text.lower().translate(_TRANS).split())
 
 
 def _filter_games(games: list[str], query: str) -> list[str]:
@@ -139,7 +214,8 @@ def _filter_games(games: list[str], query: str) -> list[str]:
     if not query_norm:
         return []
 
-    matches = [game for game in games if query_norm in _normalize(game)]
+    norm_games = [(_normalize(game), game) for game in games]
+    matches = [game for norm, game in norm_games if query_norm in norm]
     if matches:
         return matches
 
@@ -147,14 +223,16 @@ def _filter_games(games: list[str], query: str) -> list[str]:
     if not tokens:
         return []
 
-    return [
-        game for game in games if any(token in _normalize(game) for token in tokens)
-    ]
+    return [game for norm, game in norm_games if any(token in norm for token in tokens)]
 
 
-def choose_game(games: list[str] | None, exact_name: str | None) -> str:
+def choose_game(
+    games: list[str] | None,
+    games_set: frozenset[str] | None,
+    exact_name: str | None,
+) -> str:
     if exact_name:
-        if not games or exact_name in games:
+        if not games_set or exact_name in games_set:
             return exact_name
         raise RuntimeError("Game not found. Use exact name from the list.")
 
@@ -168,9 +246,11 @@ def choose_game(games: list[str] | None, exact_name: str | None) -> str:
         if len(matches) == 1:
             candidate = matches[0]
         else:
-            print("Matches:", flush=True)
-            for idx, game in enumerate(matches, start=1):
-                print(f"{idx}. {game}", flush=True)
+            listing = "\n".join(
+                f"{idx}. {game}" for idx, game in enumerate(matches, start=1)
+            )
+            sys.stdout.write(f"Matches:\n{listing}\n")
+            sys.stdout.flush()
             choice = input("Pick a number from the list: ").strip()
             if not choice.isdigit():
                 raise RuntimeError("Invalid selection.")
@@ -194,25 +274,82 @@ def choose_game(games: list[str] | None, exact_name: str | None) -> str:
     raise RuntimeError("Game name required.")
 
 
+async def _read_messages(websocket, queue: asyncio.Queue[bytes | None]) -> None:
+    # A full queue stalls recv(), which leaves backpressure to the TCP window.
+    try:
+        while True:
+            # Text frames arrive as raw bytes; the JSON parser validates them.
+            try:
+                message = await websocket.recv(decode=False)
+            except websockets.ConnectionClosedOK:
+                break
+            await queue.put(message)
+    except Exception:
+        # Still end the stream so messages already queued get printed.
+        await queue.put(None)
+        raise
+    await queue.put(None)
+
+
+async def _print_messages(queue: asyncio.Queue[bytes | None], show_raw: bool) -> None:
+    # Write straight to the byte buffer; _flush_periodically() pushes it out.
+    # Everything the loop touches is bound to a local to avoid global lookups.
+    write = sys.stdout.buffer.write
+    encoding = sys.stdout.encoding or "utf-8"
+    newline = os.linesep.encode("ascii")
+    get = queue.get
+    format_play = format_new_play
+    while True:
+        message = await get()
+        if message is None:
+            return
+        formatted = format_play(message)
+        if formatted:
+            write(formatted.encode(encoding, "replace"))
+            write(newline)
+        elif show_raw:
+            write(message.decode("utf-8", "replace").encode(encoding, "replace"))
+            write(newline)
+
+
+async def _flush_periodically(stream, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        stream.flush()
+
+
 async def stream_scores(
     ws_url: str,
     game_name: str | None,
     show_raw: bool,
+    compress: bool = False,
 ) -> None:
     backoff = 0.5
     backoff_max = 10.0
     policy_backoff = 30.0
+    if compress:
+        compression_options = {
+            "compression": "deflate",
+            "extensions": [
+                ClientPerMessageDeflateFactory(
+                    client_max_window_bits=DEFLATE_WINDOW_BITS,
+                    server_max_window_bits=DEFLATE_WINDOW_BITS,
+                )
+            ],
+        }
+    else:
+        compression_options = {"compression": None}
 
     while True:
         err: Exception | None = None
         try:
             print(f"Connecting to {ws_url} ...", flush=True)
-            async with websockets.connect(
+            async with ws_connect(
                 ws_url,
                 ping_interval=20,
                 ping_timeout=20,
                 close_timeout=5,
-                compression=None,
+                **compression_options,
             ) as websocket:
                 ack_message = await websocket.recv()
                 print(ack_message, flush=True)
@@ -223,13 +360,24 @@ async def stream_scores(
                         "action": "subscribe",
                         "filters": {"games": [game_name]},
                     }
-                    await websocket.send(json.dumps(subscribe_message))
-                async for message in websocket:
-                    formatted = format_new_play(message)
-                    if formatted:
-                        print(formatted, flush=True)
-                    elif show_raw:
-                        print(message, flush=True)
+                    await websocket.send(_dumps(subscribe_message))
+                queue: asyncio.Queue[bytes | None] = asyncio.Queue(
+                    maxsize=MESSAGE_QUEUE_SIZE
+                )
+                reader = asyncio.create_task(_read_messages(websocket, queue))
+                printer = asyncio.create_task(_print_messages(queue, show_raw))
+                flusher = asyncio.create_task(
+                    _flush_periodically(sys.stdout.buffer, STDOUT_FLUSH_INTERVAL)
+                )
+                try:
+                    # The printer drains the queue first; awaiting the reader
+                    # afterwards re-raises a connection error, if there was one.
+                    await printer
+                    await reader
+                finally:
+                    for task in (reader, printer, flusher):
+                        task.cancel()
+                    sys.stdout.buffer.flush()
         except asyncio.CancelledError:
             raise
         except Exception as exc:
@@ -239,12 +387,11 @@ async def stream_scores(
         if err is None:
             continue
 
-        error_text = str(err).lower()
-        if "too many concurrent connections" in error_text or "http 503" in error_text:
+        if _POLICY_ERR.search(str(err)):
             sleep_for = policy_backoff + random.uniform(0, policy_backoff)
         else:
             sleep_for = backoff + random.uniform(0, backoff)
-        time.sleep(sleep_for)
+        await asyncio.sleep(sleep_for)
         backoff = min(backoff * 2, backoff_max)
 
 
@@ -270,6 +417,11 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Print raw messages that do not match new_play",
     )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Negotiate permessage-deflate (saves bandwidth on slow links)",
+    )
     return parser.parse_args()
 
 
@@ -289,14 +441,15 @@ def main() -> None:
     except RuntimeError as exc:
         print(str(exc), file=sys.stderr)
         games = None
+    games_set = frozenset(games) if games else None
 
     try:
-        game_name = choose_game(games, args.game or None)
+        game_name = choose_game(games, games_set, args.game or None)
     except RuntimeError as exc:
         print(str(exc), file=sys.stderr)
         sys.exit(1)
     try:
-        asyncio.run(stream_scores(ws_url, game_name, args.raw))
+        _event_loop.run(stream_scores(ws_url, game_name, args.raw, args.compress))
     except KeyboardInterrupt:
         print("\nStopped.", flush=True)
 